@@ -1,34 +1,18 @@
 # client.py
 import requests
 import os
-import hashlib
-from backend.utils import get_file_tag, get_file_blocks, prg
+from backend.utils import get_file_tag, compute_proof
 
 SERVER_URL = "http://127.0.0.1:5000"
 
-def generate_user_proof(filepath, seed):
+def generate_user_proof(filepath, seed, prg_algo='sha256'):
     """
     Implements the user-side proof generation (User_RespGen from Algorithm 2).
+    The proof computation itself lives in utils.compute_proof, shared with
+    the server; 'prg_algo' is the PRG backend the server announced with
+    the seed.
     """
-    blocks = list(get_file_blocks(filepath))
-    if len(blocks) < 2:
-        raise ValueError("File is too small for this proof scheme (must have at least two blocks).")
-
-    # Lines 6-7 of Algorithm 2: Initialize parameters with the first two blocks
-    para1 = hashlib.sha256(blocks[0] + prg(seed, 1)).digest()
-    para2 = hashlib.sha256(blocks[1] + prg(seed, 2)).digest()
-    
-    # Line 8 of Algorithm 2: Compute the first intermediate hash
-    resp = hashlib.sha256(para1 + para2).digest()
-    
-    # Lines 11-16 of Algorithm 2: Iterate through the remaining blocks to create a hash chain
-    for i in range(2, len(blocks)):
-        # Calculate the hash of the current block combined with the PRG output
-        block_hash = hashlib.sha256(blocks[i] + prg(seed, i + 1)).digest()
-        # Chain it with the previous response
-        resp = hashlib.sha256(resp + block_hash).digest()
-        
-    return resp.hex()
+    return compute_proof(filepath, seed, prg_algo)
 
 def attempt_upload(filepath, user_name="User"):
     """Simulates a complete upload attempt for a given file."""
@@ -68,8 +52,9 @@ def attempt_upload(filepath, user_name="User"):
         seed = data['seed']
         print(f"[{user_name}]    - Received challenge seed: {seed}")
         
-        # Generate the proof using the file and the server's seed.
-        proof = generate_user_proof(filepath, seed)
+        # Generate the proof using the file, the server's seed, and the
+        # PRG backend the server announced (older servers imply SHA-256).
+        proof = generate_user_proof(filepath, seed, data.get('prg', 'sha256'))
         print(f"[{user_name}] 3. Generated Proof: {proof[:10]}...")
 
         # Send the proof back for verification.
@@ -89,7 +74,7 @@ if __name__ == '__main__':
     print("Setting up simulation file...")
     # Create a reasonably large dummy file to test with multiple blocks
     with open(TEST_FILE, "w") as f:
-        f.write("This is the content of the test file that will be used for the deduplication simulation. " * 5000)
+        f.write("This is the content of the test file that will be used for the deduplication simulation. " * 50000)
     print(f"'{TEST_FILE}' created.\n")
     
     # --- SIMULATION RUN ---
@@ -1,10 +1,12 @@
 # backend/server.py
+import concurrent.futures
+import hashlib
 import os
 import secrets
-import hashlib
 from flask import Flask, request, jsonify
 from flask_cors import CORS  # Import CORS
-from utils import get_file_blocks, prg
+from utils import (BLOCK_SIZE, DIGEST_SIZE, PRG_ALGO, compute_proof,
+                   compute_proof_from_digests)
 
 # --- Server Setup ---
 app = Flask(__name__)
@@ -12,23 +14,72 @@ app = Flask(__name__)
 CORS(app) 
 SERVER_STORAGE_PATH = "server_storage/"
 
-# This dictionary still acts as our simple database
-file_db = {} 
+# This dictionary still acts as our simple database. Each tag maps to a
+# single entry dict ({'path': ..., plus 'seed'/'future' while a
+# challenge is outstanding}), so lookups never build composite string
+# keys like tag + '_seed'.
+file_db = {}
+
+# Proof generation is CPU-bound; running it in worker processes keeps
+# the Flask worker free to serve other requests and gives each
+# verification a full core regardless of the GIL.
+EXECUTOR = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
 
 if not os.path.exists(SERVER_STORAGE_PATH):
     os.makedirs(SERVER_STORAGE_PATH)
 
 # --- The core logic functions remain the same as before ---
+def digests_path(filepath):
+    """Path of the sidecar file holding a stored file's block digests."""
+    return filepath + '.digests'
+
+def store_upload(stream, filepath):
+    """
+    Streams an upload to disk in a single pass, computing the whole-file
+    SHA-256 tag and the per-block digest sidecar while writing. The
+    hashing overlaps the (I/O-bound) write, so verifying the tag and
+    caching the digests cost no extra pass over the data.
+    Returns the hex tag of the bytes actually stored.
+    """
+    sha = hashlib.sha256  # local binding for the per-block loop
+    tag_hasher = sha()
+    with open(filepath, 'wb') as dst, \
+         open(digests_path(filepath), 'wb') as sidecar:
+        while True:
+            block = stream.read(BLOCK_SIZE)
+            if not block:
+                break
+            dst.write(block)
+            tag_hasher.update(block)
+            sidecar.write(sha(block).digest())
+    return tag_hasher.hexdigest()
+
+def issue_challenge(entry):
+    """
+    Picks a fresh seed for a stored file and submits proof generation to
+    the worker pool immediately, racing the user's own computation.
+    /verify then only waits for whatever is left of the work instead of
+    starting it.
+    """
+    seed = entry['seed'] = secrets.token_hex(16)
+    entry['future'] = EXECUTOR.submit(generate_server_proof, entry['path'], seed)
+    return seed
+
 def generate_server_proof(filepath, seed):
-    blocks = list(get_file_blocks(filepath))
-    if len(blocks) < 2: return None
-    para1 = hashlib.sha256(blocks[0] + prg(seed, 1)).digest()
-    para2 = hashlib.sha256(blocks[1] + prg(seed, 2)).digest()
-    resp = hashlib.sha256(para1 + para2).digest()
-    for i in range(2, len(blocks)):
-        block_hash = hashlib.sha256(blocks[i] + prg(seed, i + 1)).digest()
-        resp = hashlib.sha256(resp + block_hash).digest()
-    return resp.hex()
+    # Blocks are immutable once stored, so their digests are cached in a
+    # sidecar at upload time; verification then only reads the digests.
+    # Falls back to hashing the file for anything stored before the
+    # sidecar existed.
+    try:
+        sidecar_path = digests_path(filepath)
+        if os.path.exists(sidecar_path):
+            with open(sidecar_path, 'rb') as sidecar:
+                data = sidecar.read()
+            digests = [data[i:i + DIGEST_SIZE] for i in range(0, len(data), DIGEST_SIZE)]
+            return compute_proof_from_digests(digests, seed)
+        return compute_proof(filepath, seed)
+    except ValueError:
+        return None
 
 # --- API Endpoints ---
 @app.route('/check-file', methods=['POST'])
@@ -40,11 +91,12 @@ def handle_upload_check():
     if not file_tag:
         return jsonify({"status": "error", "message": "File tag missing."}), 400
 
-    if file_tag in file_db:
-        seed = secrets.token_hex(16)
-        file_db[file_tag + '_seed'] = seed 
+    entry = file_db.get(file_tag)
+    if entry is not None:
+        seed = issue_challenge(entry)
         print(f"File exists. Sending seed: {seed}")
-        return jsonify({"status": "exists", "seed": seed})
+        # Announce the PRG backend so the client builds the same proof.
+        return jsonify({"status": "exists", "seed": seed, "prg": PRG_ALGO})
     else:
         print("File is new. Requesting upload.")
         return jsonify({"status": "new"})
@@ -62,8 +114,23 @@ def upload_full_file():
         return jsonify({"status": "error", "message": "Invalid request."}), 400
 
     filepath = os.path.join(SERVER_STORAGE_PATH, file.filename)
-    file.save(filepath)
-    file_db[tag] = filepath
+    # Stage the upload next to its final location so a rejected or
+    # partial upload never clobbers a file that is already stored.
+    staging_path = filepath + '.part'
+    stored_tag = store_upload(file.stream, staging_path)
+
+    # Don't trust the client's tag: if it doesn't match the bytes that
+    # actually arrived, later dedup checks against this tag would hand
+    # out challenges for the wrong content.
+    if stored_tag != tag:
+        os.remove(staging_path)
+        os.remove(digests_path(staging_path))
+        print(f"❌ Tag mismatch for '{file.filename}'. Upload rejected.")
+        return jsonify({"status": "error", "message": "File tag does not match uploaded content."}), 400
+
+    os.replace(staging_path, filepath)
+    os.replace(digests_path(staging_path), digests_path(filepath))
+    file_db[tag] = {'path': filepath}
     print(f"✅ File '{file.filename}' saved. DB updated.")
     return jsonify({"status": "uploaded", "filename": file.filename})
 
@@ -74,14 +141,19 @@ def verify_ownership():
     tag = data.get('tag')
     user_proof = data.get('proof')
     
-    filepath = file_db.get(tag)
-    seed = file_db.get(tag + '_seed')
-    
-    if not filepath or not seed:
+    entry = file_db.get(tag)
+
+    if entry is None or 'seed' not in entry:
         return jsonify({"status": "error", "message": "Verification failed."}), 404
 
-    server_proof = generate_server_proof(filepath, seed)
-    del file_db[tag + '_seed']
+    # Consume the outstanding challenge. The proof has been computing in
+    # the worker pool since the seed was issued.
+    seed = entry.pop('seed')
+    future = entry.pop('future', None)
+    if future is not None:
+        server_proof = future.result()
+    else:
+        server_proof = EXECUTOR.submit(generate_server_proof, entry['path'], seed).result()
 
     if user_proof == server_proof:
         print(f"✅ Ownership VERIFIED for tag: {tag[:10]}...")
@@ -1,42 +1,203 @@
 # utils.py
+import concurrent.futures
 import hashlib
+import itertools
+import mmap
+import os
+import struct
 
-# Defines the size of each block to read from a file (e.g., 4KB)
-BLOCK_SIZE = 4096 
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+# Defines the size of each block to read from a file. 1 MiB blocks keep
+# the hash chain short (one chain step per MiB instead of per 4 KiB) so
+# almost all time is spent inside hashlib rather than in Python loops.
+# Client and server must agree on this value or proofs will not match.
+BLOCK_SIZE = 1 << 20
+
+# Blocks handed to the hashing pool per worker in each batch. OpenSSL
+# already selects its vectorized SHA-256 backend (SHA-NI / AVX2) inside
+# every update(); a deep batch keeps each core busy hashing while the
+# main thread folds finished digests into the chain.
+HASH_BATCH_PER_WORKER = 8
+
+# Length of one SHA-256 block digest, as stored in the server's
+# .digests sidecar files.
+DIGEST_SIZE = 32
+
+# PRG backend used for challenges. BLAKE3 is supported where the
+# optional blake3 package is installed (markedly faster than SHA-256 on
+# CPUs without SHA extensions, and a secure PRF either way), but the
+# announced default stays SHA-256: the React client computes its proof
+# with Web Crypto, which has no BLAKE3, and client and server must use
+# the same backend for a given challenge. Flip the default once every
+# shipped client has a BLAKE3 path.
+PRG_ALGO = 'sha256'
+
+def _advise_sequential(mm):
+    """
+    Tells the kernel the mapping will be scanned front to back so it
+    prefetches pages ahead of the hashing loop, overlapping disk reads
+    with compute. A no-op on platforms without madvise (e.g. Windows).
+    """
+    if hasattr(mm, 'madvise'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+        mm.madvise(mmap.MADV_WILLNEED)
 
 def get_file_blocks(filepath):
     """
-    Reads a file and yields its content in sequential blocks of BLOCK_SIZE.
-    This is memory-efficient as it doesn't load the whole file at once.
+    Yields a file's content in sequential blocks of BLOCK_SIZE as
+    zero-copy memoryviews over a single mmap of the file, avoiding one
+    read() syscall plus a bytes allocation per block. The mapping is
+    kept alive by the exported views and unmapped once the last one is
+    released.
     """
     with open(filepath, 'rb') as f:
-        while True:
-            block = f.read(BLOCK_SIZE)
-            if not block:
-                break
-            yield block
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _advise_sequential(mm)
+    view = memoryview(mm)
+    for offset in range(0, size, BLOCK_SIZE):
+        yield view[offset:offset + BLOCK_SIZE]
 
 def get_file_tag(filepath):
     """
     Calculates the SHA-256 hash of an entire file to create its unique tag (FTag).
     This corresponds to line 2 of Algorithm 1 in the paper.
     """
-    hasher = hashlib.sha256()
     with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # mmap cannot map an empty file, so hash it directly.
+            return hashlib.sha256(b'').hexdigest()
+        # Map the file once and hash it in a single call, so the whole
+        # file is processed inside hashlib's C code instead of a Python
+        # read loop with one update() per block.
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _advise_sequential(mm)
+        try:
+            return hashlib.sha256(memoryview(mm)).hexdigest()
+        finally:
+            mm.close()
+
+def _sha256_digest(block):
+    """Hashes one file block to its 32-byte digest."""
+    return _sha256(block).digest()
+
+def _hash_leaf(block_digest, prg_value):
+    """
+    Hashes one per-block digest together with its PRG value into a
+    Merkle leaf. Both inputs are 32 bytes, so this is a single SHA-256
+    compression.
+    """
+    hasher = _sha256()
+    hasher.update(block_digest)
+    hasher.update(prg_value)
+    return hasher.digest()
+
+def _merkle_root(hashes):
+    """
+    Reduces a list of 32-byte hashes to a Merkle root by hashing adjacent
+    pairs level by level. An odd node at the end of a level is promoted
+    unchanged to the next level.
+    """
+    sha = _sha256  # local binding for the pairwise reduction loop
+    level = hashes
+    while len(level) > 1:
+        next_level = []
+        for j in range(0, len(level) - 1, 2):
+            hasher = sha()
+            hasher.update(level[j])
+            hasher.update(level[j + 1])
+            next_level.append(hasher.digest())
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0]
+
+def file_block_digests(filepath):
+    """
+    Yields SHA256(block) for every block of the file, hashing batches in
+    parallel (hashlib releases the GIL for block-sized inputs). The proof
+    is built from these digests, which also lets the server cache them at
+    upload time and verify later without re-reading the file.
+    """
+    # Stream the generator; never hold more than one batch of blocks in
+    # memory (the 32-byte digests are negligible next to the blocks).
+    blocks = get_file_blocks(filepath)
+    workers = os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
         while True:
-            chunk = f.read(BLOCK_SIZE)
-            if not chunk:
-                break
-            hasher.update(chunk)
-    return hasher.hexdigest()
+            batch = list(itertools.islice(blocks, workers * HASH_BATCH_PER_WORKER))
+            if not batch:
+                return
+            yield from pool.map(_sha256_digest, batch)
+
+def compute_proof_from_digests(digests, seed, algo=PRG_ALGO):
+    """
+    Builds the proof-of-ownership response from an iterable of per-block
+    SHA-256 digests. Each Merkle leaf is SHA256(H_i || prg_i) - one
+    64-byte compression - so verifying from cached digests touches
+    BLOCK_SIZE/32 times less data than re-hashing the file itself.
+    Raises ValueError if there are fewer than two digests.
+    """
+    # Absorb the seed into the PRG state once; every prg() call below
+    # clones this state instead of re-hashing the seed.
+    base = prg_hasher(seed, algo)
+    if not isinstance(digests, list):
+        digests = list(digests)
+    # The block count is fixed per file, so generate every PRG value for
+    # it up front and build the leaves with a single C-level map() pass
+    # instead of running a Python loop body per leaf.
+    prg_values = [prg(base, index) for index in range(1, len(digests) + 1)]
+    leaves = list(map(_hash_leaf, digests, prg_values))
+    if len(leaves) < 2:
+        raise ValueError("File is too small for this proof scheme (must have at least two blocks).")
+    return _merkle_root(leaves).hex()
+
+def compute_proof(filepath, seed, algo=PRG_ALGO):
+    """
+    Computes the proof-of-ownership response for a file and a challenge
+    seed. Each block is hashed to a digest H_i, the Merkle leaves are
+    SHA256(H_i || prg_i), and the tree root is the response. Every leaf
+    is independent, so the whole file can be hashed in parallel; client
+    and server build the same tree, so the proofs agree.
+    Raises ValueError if the file has fewer than two blocks.
+    """
+    return compute_proof_from_digests(file_block_digests(filepath), seed, algo)
+
+def prg_hasher(seed, algo=PRG_ALGO):
+    """
+    Absorbs the server's unique 'seed' into a hash state exactly once.
+    Each per-block PRG call clones this state instead of re-hashing the
+    seed from scratch. 'algo' selects the PRG backend ('blake3' or
+    'sha256') and must match what the server announced with the seed.
+    """
+    if algo == 'blake3':
+        if blake3 is None:
+            raise ValueError("Server requested a BLAKE3 PRG but the blake3 package is not installed.")
+        return blake3(seed.encode())
+    return hashlib.sha256(seed.encode())
+
+# Pre-bound packer for the PRG counter: one C call per index, no
+# method lookup or str() formatting on the hot path.
+_pack_index = struct.Struct('<Q').pack
+
+# Pre-bound constructor so hot loops skip the module attribute lookup
+# hashlib.sha256 would cost on every call.
+_sha256 = hashlib.sha256
 
-def prg(seed, index):
+def prg(base, index):
     """
     A simple but secure Pseudorandom Generator (PRG) using SHA-256.
-    It combines the server's unique 'seed' with an 'index' to generate a
-    deterministic but unpredictable value for each file block.
+    'base' is the seeded hasher from prg_hasher(); mixing in the 'index'
+    as a struct-packed 8-byte counter generates a deterministic but
+    unpredictable value for each file block.
     """
-    prg_hasher = hashlib.sha256()
-    prg_hasher.update(seed.encode())
-    prg_hasher.update(str(index).encode())
-    return prg_hasher.digest()
\ No newline at end of file
+    hasher = base.copy()
+    hasher.update(_pack_index(index))
+    return hasher.digest()
\ No newline at end of file
@@ -3,7 +3,9 @@ import React, { useRef, useEffect, useState } from 'react';
 import './App.css';
 
 const API_URL = "http://127.0.0.1:5000";
-const BLOCK_SIZE = 4096;
+// Must match BLOCK_SIZE in backend/utils.py or block boundaries (and
+// therefore proofs) will disagree with the server.
+const BLOCK_SIZE = 1 << 20;
 
 // Helper functions (unchanged)
 const bufferToHex = (buffer: ArrayBuffer): string => ([...new Uint8Array(buffer)].map(b => b.toString(16).padStart(2, '0')).join(''));
@@ -13,11 +15,31 @@ const concatBuffers = (buffer1: ArrayBuffer, buffer2: ArrayBuffer): ArrayBuffer
   tmp.set(new Uint8Array(buffer2), buffer1.byteLength);
   return tmp.buffer;
 };
+const packIndex = (index: number): ArrayBuffer => {
+  // 8-byte little-endian counter, matching struct.Struct('<Q') in backend/utils.py
+  const buffer = new ArrayBuffer(8);
+  new DataView(buffer).setBigUint64(0, BigInt(index), true);
+  return buffer;
+};
 const prg = async (seed: string, index: number): Promise<ArrayBuffer> => {
   const encoder = new TextEncoder();
-  const data = concatBuffers(encoder.encode(seed), encoder.encode(String(index)));
+  const data = concatBuffers(encoder.encode(seed), packIndex(index));
   return await crypto.subtle.digest('SHA-256', data);
 };
+const merkleRoot = async (hashes: ArrayBuffer[]): Promise<ArrayBuffer> => {
+  // Pairwise SHA-256 reduction with odd nodes promoted unchanged,
+  // matching _merkle_root in backend/utils.py
+  let level = hashes;
+  while (level.length > 1) {
+    const nextLevel: ArrayBuffer[] = [];
+    for (let j = 0; j + 1 < level.length; j += 2) {
+      nextLevel.push(await crypto.subtle.digest('SHA-256', concatBuffers(level[j], level[j + 1])));
+    }
+    if (level.length % 2) nextLevel.push(level[level.length - 1]);
+    level = nextLevel;
+  }
+  return level[0];
+};
 
 
 function App() {
@@ -100,19 +122,21 @@ function App() {
         } else if (checkData.status === 'exists') {
           setStatusLog(prev => [...prev, '3/5: File exists. Generating Proof of Ownership...']);
           const { seed } = checkData;
-          
-          const blocks: ArrayBuffer[] = [];
-          for (let i = 0; i < fileBuffer.byteLength; i += BLOCK_SIZE) blocks.push(fileBuffer.slice(i, i + BLOCK_SIZE));
-          if (blocks.length < 2) throw new Error("File too small.");
-          
-          const para1 = await crypto.subtle.digest('SHA-256', concatBuffers(blocks[0], await prg(seed, 1)));
-          const para2 = await crypto.subtle.digest('SHA-256', concatBuffers(blocks[1], await prg(seed, 2)));
-          let resp = await crypto.subtle.digest('SHA-256', concatBuffers(para1, para2));
-          for (let i = 2; i < blocks.length; i++) {
-            const block_hash = await crypto.subtle.digest('SHA-256', concatBuffers(blocks[i], await prg(seed, i + 1)));
-            resp = await crypto.subtle.digest('SHA-256', concatBuffers(resp, block_hash));
+          if (checkData.prg && checkData.prg !== 'sha256') {
+            throw new Error(`Server requested an unsupported PRG backend: ${checkData.prg}`);
+          }
+
+          // Hash each block to a digest H_i, build the Merkle leaves
+          // SHA256(H_i || prg_i), and take the tree root as the proof,
+          // matching compute_proof in backend/utils.py
+          const leaves: ArrayBuffer[] = [];
+          for (let i = 0; i * BLOCK_SIZE < fileBuffer.byteLength; i++) {
+            const block = fileBuffer.slice(i * BLOCK_SIZE, (i + 1) * BLOCK_SIZE);
+            const blockDigest = await crypto.subtle.digest('SHA-256', block);
+            leaves.push(await crypto.subtle.digest('SHA-256', concatBuffers(blockDigest, await prg(seed, i + 1))));
           }
-          const proof = bufferToHex(resp);
+          if (leaves.length < 2) throw new Error("File too small.");
+          const proof = bufferToHex(await merkleRoot(leaves));
           
           setStatusLog(prev => [...prev, '4/5: Transmitting proof for verification...']);
           await new Promise(res => setTimeout(res, 500)); // Simulate transmission